@@ -0,0 +1,359 @@
+"""
+# SmartBloom Hyperparameter Sweep — Flower Classifier
+
+Runs train_flower_classifier.py over a grid of hyperparameters (configs/sweep.yaml).
+
+## Features
+- Trials run as parallel processes with a per-trial thread limit
+- Unpromising trials are stopped early from their per-epoch metrics.json
+  (successive halving or median stopping)
+- Images are pre-resized once into a cache shared by every trial
+- Writes a leaderboard of val accuracy vs training time and CPU inference latency
+  to artifacts/flower_sweep/<timestamp>/
+
+    python src/sweep_flower_classifier.py pruner=median threads_per_trial=4
+"""
+
+import os
+import csv
+import sys
+import json
+import time
+import random
+import shutil
+import hashlib
+import itertools
+import statistics
+import subprocess
+from datetime import datetime
+
+from PIL import Image
+from tqdm import tqdm
+
+import torch
+import torch.nn as nn
+from torchvision.models import efficientnet_b0
+
+import hydra
+from omegaconf import DictConfig, OmegaConf
+from hydra.utils import get_original_cwd
+
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+# Config keys train_flower_classifier.py actually reads.
+TRAINER_KEYS = {
+    "seed", "device", "data_dir", "save_dir", "batch_size", "num_workers", "epochs",
+    "lr", "image_size", "pretrained", "num_classes", "run_dir",
+}
+# Trainer keys set by the sweep itself for every trial; they can't be swept.
+FIXED_KEYS = {"epochs", "num_workers", "data_dir", "run_dir", "device"}
+PRUNERS = {"halving", "median", "none"}
+
+
+def build_trials(space: dict, max_trials, seed: int):
+    """Expand the search space into a list of override dicts."""
+    keys = list(space.keys())
+    grid = [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+    if max_trials and int(max_trials) < len(grid):
+        grid = random.Random(seed).sample(grid, int(max_trials))
+    return grid
+
+
+def dataset_fingerprint(files) -> dict:
+    """File count, total size and newest mtime — changes whenever the source dataset does."""
+    stats = [os.stat(f) for f in files]
+    return {
+        "files": len(stats),
+        "bytes": sum(st.st_size for st in stats),
+        "newest_mtime": max((st.st_mtime for st in stats), default=0.0),
+    }
+
+
+def build_dataset_cache(data_dir: str, cache_root: str, short_side: int) -> str:
+    """Copy data_dir with every image downscaled to short_side; reused while the source is unchanged."""
+    source = os.path.abspath(data_dir)
+    source_key = hashlib.sha1(source.encode("utf-8")).hexdigest()[:10]
+    cache_dir = os.path.join(cache_root, f"{os.path.basename(source)}-{source_key}", f"short{short_side}")
+    marker = os.path.join(cache_dir, ".complete")
+
+    files = []
+    for root, _, names in os.walk(source):
+        files.extend(os.path.join(root, n) for n in names)
+    fingerprint = dataset_fingerprint(files)
+
+    if os.path.exists(marker):
+        with open(marker, "r") as f:
+            cached = json.load(f).get("fingerprint")
+        if cached == fingerprint:
+            print(f"📦 Reusing dataset cache: {cache_dir}")
+            return cache_dir
+        print(f"♻️ Source dataset changed since the cache was built, rebuilding: {cache_dir}")
+    if os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
+
+    for src in tqdm(files, desc=f"Caching images (short side {short_side})", unit="img"):
+        dst = os.path.join(cache_dir, os.path.relpath(src, source))
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if os.path.splitext(src)[1].lower() not in IMAGE_EXTENSIONS:
+            shutil.copy(src, dst)
+            continue
+        with Image.open(src) as img:
+            scale = short_side / min(img.size)
+            if scale < 1.0:
+                img = img.convert("RGB")
+                img = img.resize((round(img.width * scale), round(img.height * scale)), Image.BILINEAR)
+                img.save(dst, quality=95)
+        if scale >= 1.0:
+            shutil.copy(src, dst)  # already small enough, keep the original bytes
+
+    with open(marker, "w") as f:
+        json.dump({"source": source, "fingerprint": fingerprint, "created": datetime.now().isoformat()}, f, indent=2)
+    return cache_dir
+
+
+def read_val_acc(run_dir: str, previous):
+    """Per-epoch val accuracy from a trial's metrics.json (previous value if mid-write)."""
+    try:
+        with open(os.path.join(run_dir, "metrics.json"), "r") as f:
+            return json.load(f).get("val_acc", [])
+    except (OSError, ValueError):
+        return previous
+
+
+def halving_should_prune(trial, trials, min_epochs: int, eta: int) -> bool:
+    """Successive halving: at each rung keep only the top 1/eta of trials that reached it."""
+    history = trial["val_acc"]
+    rung = min_epochs
+    while rung <= len(history):
+        if rung not in trial["rungs_passed"]:
+            scores = [t["val_acc"][rung - 1] for t in trials if len(t["val_acc"]) >= rung]
+            if len(scores) < eta:
+                return False  # not enough peers yet, decide later
+            keep = max(1, len(scores) // eta)
+            cutoff = sorted(scores, reverse=True)[keep - 1]
+            if history[rung - 1] < cutoff:
+                return True
+            trial["rungs_passed"].add(rung)
+        rung *= eta
+    return False
+
+
+def median_should_prune(trial, trials, min_epochs: int, min_peers: int) -> bool:
+    """Median stopping: prune if the best accuracy so far is below the peers' median at this epoch."""
+    epoch = len(trial["val_acc"])
+    if epoch < min_epochs:
+        return False
+    peers = [max(t["val_acc"][:epoch]) for t in trials if t is not trial and len(t["val_acc"]) >= epoch]
+    if len(peers) < min_peers:
+        return False
+    return max(trial["val_acc"]) < statistics.median(peers)
+
+
+def measure_latency(model_path: str, image_size: int, threads: int, runs: int):
+    """Median single-image CPU forward time in milliseconds."""
+    checkpoint = torch.load(model_path, map_location="cpu")
+    state_dict = checkpoint["model_state_dict"]
+    model = efficientnet_b0(weights=None)
+    model.classifier[1] = nn.Linear(model.classifier[1].in_features, state_dict["classifier.1.weight"].shape[0])
+    model.load_state_dict(state_dict)
+    model.eval()
+
+    torch.set_num_threads(threads)
+    x = torch.randn(1, 3, image_size, image_size)
+    timings = []
+    with torch.no_grad():
+        for _ in range(3):
+            model(x)
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(x)
+            timings.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(timings)
+
+
+def launch_trial(trial, orig_cwd: str, threads: int):
+    overrides = {**trial["params"], **trial["fixed"], "run_dir": trial["run_dir"]}
+    args = [f"++{k}='{str(v).replace(os.sep, '/')}'" if isinstance(v, str) else f"++{k}={v}" for k, v in overrides.items()]
+    hydra_dir = os.path.join(trial["run_dir"], "hydra").replace(os.sep, "/")
+    args.append(f"hydra.run.dir='{hydra_dir}'")
+
+    env = os.environ.copy()
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        env[var] = str(threads)
+
+    os.makedirs(trial["run_dir"], exist_ok=True)
+    trial["log"] = open(os.path.join(trial["run_dir"], "train.log"), "w")
+    trial["proc"] = subprocess.Popen(
+        [sys.executable, os.path.join(orig_cwd, "src", "train_flower_classifier.py"), *args],
+        cwd=orig_cwd, env=env, stdout=trial["log"], stderr=subprocess.STDOUT,
+    )
+    trial["start"] = time.time()
+    trial["status"] = "running"
+    print(f"🚀 {trial['name']} started: {json.dumps(trial['params'])}")
+
+
+def finish_trial(trial, status: str):
+    if status == "pruned":
+        trial["proc"].terminate()
+        trial["proc"].wait()
+    trial["log"].close()
+    # metrics.json is rewritten after every epoch, so its mtime marks the last finished
+    # epoch without the up-to-poll_interval delay of checking the clock here
+    metrics_path = os.path.join(trial["run_dir"], "metrics.json")
+    end = os.path.getmtime(metrics_path) if os.path.exists(metrics_path) else time.time()
+    trial["train_time_s"] = end - trial["start"]
+    trial["status"] = status
+    best = max(trial["val_acc"]) if trial["val_acc"] else 0.0
+    print(f"{'✂️' if status == 'pruned' else '🏁'} {trial['name']} {status} after "
+          f"{len(trial['val_acc'])} epochs — best val acc {best:.2f}%")
+
+
+@hydra.main(config_path="../configs", config_name="sweep", version_base=None)
+def main(cfg: DictConfig):
+    orig_cwd = get_original_cwd()
+
+    cfg_dict = OmegaConf.to_container(cfg, resolve=True)
+    print("\n🧠 Sweep config:")
+    print(json.dumps(cfg_dict, indent=2))
+
+    space = cfg_dict["space"]
+    epochs = int(cfg.get("epochs", 30))
+    threads = int(cfg.get("threads_per_trial", 2))
+    num_workers = int(cfg.get("num_workers", 1))
+    # Each trial runs its torch threads plus num_workers dataloader processes
+    max_parallel = cfg.get("max_parallel", "auto")
+    if str(max_parallel).lower() == "auto":
+        max_parallel = max(1, (os.cpu_count() or 1) // (threads + num_workers))
+    else:
+        max_parallel = int(max_parallel)
+    pruner = str(cfg.get("pruner", "halving")).lower()
+    min_epochs = int(cfg.get("min_epochs", 3))
+    eta = int(cfg.get("reduction_factor", 3))
+    min_peers = int(cfg.get("min_peers", 2))
+    poll_interval = float(cfg.get("poll_interval", 10))
+
+    device = str(cfg.get("device", "cpu"))
+
+    if pruner not in PRUNERS:
+        raise ValueError(f"pruner must be one of {', '.join(sorted(PRUNERS))}, got {pruner}")
+    if min_epochs < 1:
+        raise ValueError(f"min_epochs must be >= 1, got {min_epochs}")
+    if eta < 2:
+        raise ValueError(f"reduction_factor must be >= 2, got {eta}")
+    swept_fixed = sorted(FIXED_KEYS & set(space))
+    if swept_fixed:
+        raise ValueError(f"These keys are set by the sweep and can't be swept: {', '.join(swept_fixed)}")
+    unknown = sorted(set(space) - TRAINER_KEYS)
+    if unknown:
+        raise ValueError(
+            f"train_flower_classifier.py doesn't read these keys, so sweeping them has no effect: {', '.join(unknown)}"
+        )
+
+    trial_params = build_trials(space, cfg.get("max_trials", None), int(cfg.get("seed", 42)))
+    if not trial_params:
+        raise ValueError("The search space yields no trials (check for empty lists in `space` or max_trials)")
+
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    sweep_dir = os.path.join(orig_cwd, cfg.get("save_dir", "artifacts/flower_sweep"), timestamp)
+    os.makedirs(sweep_dir, exist_ok=True)
+    OmegaConf.save(config=cfg, f=os.path.join(sweep_dir, "sweep_config.yaml"))
+
+    # 📦 Shared dataset cache; by default sized for the largest image_size in the sweep
+    data_dir = os.path.join(orig_cwd, cfg.get("data_dir", "data/flower_classification"))
+    if bool(cfg.get("cache_dataset", True)):
+        short_side = cfg.get("cache_short_side", "auto")
+        if str(short_side).lower() == "auto":
+            short_side = int(max(space.get("image_size", [224])) * 1.15) + 1
+        cache_root = os.path.join(orig_cwd, cfg.get("cache_dir", "data/cache/flower_classification"))
+        data_dir = build_dataset_cache(data_dir, cache_root, int(short_side))
+
+    fixed = {"epochs": epochs, "num_workers": num_workers, "data_dir": data_dir, "device": device}
+    trials = [
+        {
+            "name": f"trial_{i:03d}",
+            "params": params,
+            "fixed": fixed,
+            "run_dir": os.path.join(sweep_dir, f"trial_{i:03d}"),
+            "status": "pending",
+            "val_acc": [],
+            "rungs_passed": set(),
+        }
+        for i, params in enumerate(trial_params)
+    ]
+    print(f"\n🔍 {len(trials)} trials, {max_parallel} in parallel, {threads} threads each, device={device}, pruner={pruner}\n")
+
+    pending = list(trials)
+    running = []
+    try:
+        while pending or running:
+            while pending and len(running) < max_parallel:
+                trial = pending.pop(0)
+                launch_trial(trial, orig_cwd, threads)
+                running.append(trial)
+
+            time.sleep(poll_interval)
+
+            for trial in list(running):
+                done = trial["proc"].poll() is not None
+                trial["val_acc"] = read_val_acc(trial["run_dir"], trial["val_acc"])
+                if done:
+                    finish_trial(trial, "completed" if trial["proc"].returncode == 0 else "failed")
+                elif pruner == "halving" and halving_should_prune(trial, trials, min_epochs, eta):
+                    finish_trial(trial, "pruned")
+                elif pruner == "median" and median_should_prune(trial, trials, min_epochs, min_peers):
+                    finish_trial(trial, "pruned")
+                else:
+                    continue
+                running.remove(trial)
+    finally:
+        # Don't leave orphaned trainers behind on Ctrl+C or errors
+        for trial in running:
+            trial["proc"].terminate()
+            trial["log"].close()
+
+    # ⏱️ Latency only depends on image_size (the architecture is fixed), so time it
+    # once per size using any trial checkpoint, pruned or completed
+    latencies = {}
+    for trial in trials:
+        model_path = os.path.join(trial["run_dir"], "best_model.pth")
+        image_size = int(trial["params"].get("image_size", 224))
+        if image_size not in latencies and os.path.exists(model_path):
+            latencies[image_size] = measure_latency(model_path, image_size, threads, int(cfg.get("latency_runs", 20)))
+
+    # 📊 Leaderboard
+    leaderboard = []
+    for trial in trials:
+        latency_ms = None
+        if os.path.exists(os.path.join(trial["run_dir"], "best_model.pth")):
+            latency_ms = latencies.get(int(trial["params"].get("image_size", 224)))
+        leaderboard.append({
+            "trial": trial["name"],
+            "status": trial["status"],
+            **trial["params"],
+            "epochs_run": len(trial["val_acc"]),
+            "best_val_acc": max(trial["val_acc"]) if trial["val_acc"] else 0.0,
+            "train_time_s": round(trial.get("train_time_s", 0.0), 1),
+            "latency_ms": round(latency_ms, 2) if latency_ms is not None else None,
+            "run_dir": trial["run_dir"],
+        })
+    leaderboard.sort(key=lambda row: row["best_val_acc"], reverse=True)
+
+    with open(os.path.join(sweep_dir, "leaderboard.json"), "w") as f:
+        json.dump(leaderboard, f, indent=2)
+    with open(os.path.join(sweep_dir, "leaderboard.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(leaderboard[0].keys()))
+        writer.writeheader()
+        writer.writerows(leaderboard)
+
+    print("\n🏆 Leaderboard:")
+    for row in leaderboard:
+        params = ", ".join(f"{k}={row[k]}" for k in space)
+        latency = f"{row['latency_ms']:.1f}ms" if row["latency_ms"] is not None else "-"
+        print(f"{row['trial']}  {row['status']:<9} acc={row['best_val_acc']:6.2f}%  "
+              f"time={row['train_time_s']:7.1f}s  latency={latency:>8}  {params}")
+    print(f"\n📦 Sweep results stored in: {sweep_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ Goal: Train a YOLOv8s model for leaf disease detection.
 """
 import os
 import json
+import time
 import shutil
 from datetime import datetime
 import hydra
@@ -23,12 +24,103 @@ from hydra.utils import get_original_cwd
 
 try:
     from ultralytics import YOLO
+    from ultralytics.cfg import DEFAULT_CFG_DICT
 except Exception as e:
     raise ImportError(
         "❌ Ultralytics package missing. Install it with: pip install ultralytics"
     ) from e
 
 
+# Keys handled explicitly by this script; everything else in the config is
+# forwarded to model.train() as an Ultralytics training argument.
+RESERVED_KEYS = {
+    "data", "model", "epochs", "imgsz", "batch", "device", "workers", "lr", "lr0",
+    "verbose", "save_dir", "project", "name", "exist_ok",
+}
+
+
+def resolve_workers(workers) -> int:
+    """Return the requested dataloader worker count; "auto" leaves one core for the main process.
+
+    Ultralytics forces workers=0 on cpu/mps devices, so this only takes effect on GPU.
+    """
+    if str(workers).lower() == "auto":
+        return max(1, min((os.cpu_count() or 1) - 1, 8))
+    return int(workers)
+
+
+def collect_train_args(cfg_dict: dict) -> dict:
+    """Pick the extra Ultralytics training arguments out of the config."""
+    extra = {}
+    for key, value in cfg_dict.items():
+        if key in RESERVED_KEYS:
+            continue
+        if key not in DEFAULT_CFG_DICT:
+            print(f"⚠️ Ignoring unknown training argument: {key}={value}")
+            continue
+        extra[key] = value
+    return extra
+
+
+class EpochTimer:
+    """Ultralytics callbacks that split each epoch into dataloader wait vs compute time."""
+
+    def __init__(self, log_path: str):
+        self.log_path = log_path
+        self.history = []
+        self._mark = 0.0
+        self._batch_start = 0.0
+        self._train_end = 0.0
+        self._data_wait = 0.0
+        self._compute = 0.0
+        self._batches = 0
+
+    def register(self, model):
+        model.add_callback("on_train_epoch_start", self.on_train_epoch_start)
+        model.add_callback("on_train_batch_start", self.on_train_batch_start)
+        model.add_callback("on_train_batch_end", self.on_train_batch_end)
+        model.add_callback("on_train_epoch_end", self.on_train_epoch_end)
+        model.add_callback("on_fit_epoch_end", self.on_fit_epoch_end)
+
+    def on_train_epoch_start(self, trainer):
+        self._data_wait = 0.0
+        self._compute = 0.0
+        self._batches = 0
+        self._mark = time.perf_counter()
+
+    def on_train_batch_start(self, trainer):
+        self._batch_start = time.perf_counter()
+        self._data_wait += self._batch_start - self._mark
+
+    def on_train_batch_end(self, trainer):
+        self._mark = time.perf_counter()
+        self._compute += self._mark - self._batch_start
+        self._batches += 1
+
+    def on_train_epoch_end(self, trainer):
+        self._train_end = time.perf_counter()
+
+    def on_fit_epoch_end(self, trainer):
+        val_time = time.perf_counter() - self._train_end
+        busy = self._data_wait + self._compute
+        entry = {
+            "epoch": int(trainer.epoch) + 1,
+            "batches": self._batches,
+            "data_wait_s": round(self._data_wait, 3),
+            "compute_s": round(self._compute, 3),
+            "val_s": round(val_time, 3),
+            "data_wait_pct": round(100.0 * self._data_wait / busy, 1) if busy > 0 else 0.0,
+        }
+        self.history.append(entry)
+        print(
+            f"⏱️ Epoch {entry['epoch']}: data wait {entry['data_wait_s']:.1f}s "
+            f"({entry['data_wait_pct']:.1f}%), compute {entry['compute_s']:.1f}s, "
+            f"val {entry['val_s']:.1f}s"
+        )
+        with open(self.log_path, "w") as f:
+            json.dump(self.history, f, indent=2)
+
+
 @hydra.main(config_path="../configs", config_name="disease", version_base=None)
 def main(cfg: DictConfig):
     orig_cwd = get_original_cwd()
@@ -54,32 +146,46 @@ def main(cfg: DictConfig):
     imgsz = int(cfg.get("imgsz", 640))
     batch = int(cfg.get("batch", 16))
     device = cfg.get("device", "0")
-    workers = int(cfg.get("workers", 4))
-    lr = float(cfg.get("lr", 0.01))
+    workers = resolve_workers(cfg.get("workers", 4))
+    lr = float(cfg.get("lr0", cfg.get("lr", 0.01)))  # Ultralytics-style lr0 wins over lr
+    verbose = bool(cfg.get("verbose", True))
     project = artifact_root
     name = f"{timestamp}_{model_name.replace('.pt', '')}"
+    train_args = collect_train_args(cfg_dict)
 
     print(f"\n🚀 Starting training with model: {model_name}")
     print(f"Dataset: {data_yaml}")
-    print(f"epochs={epochs}, imgsz={imgsz}, batch={batch}, lr={lr}, device={device}\n")
+    print(f"epochs={epochs}, imgsz={imgsz}, batch={batch}, lr={lr}, device={device}, workers={workers} (requested)")
+    print(f"Extra training args: {json.dumps(train_args)}\n")
 
     # 🧠 Load YOLO model (works for v8, v9, v10)
     model = YOLO(model_name)
 
+    # ⏱️ Per-epoch dataloader wait vs compute breakdown
+    timer = EpochTimer(os.path.join(run_dir, "epoch_timing.json"))
+    timer.register(model)
+
     # Train
-    model.train(
-        data=str(data_yaml),
-        epochs=epochs,
-        imgsz=imgsz,
-        batch=batch,
-        device=device,
-        workers=workers,
-        lr0=lr,
-        project=project,
-        name=name,
-        exist_ok=True,
-        verbose=True,
-    )
+    model.train(**{
+        **train_args,
+        "data": str(data_yaml),
+        "epochs": epochs,
+        "imgsz": imgsz,
+        "batch": batch,
+        "device": device,
+        "workers": workers,
+        "lr0": lr,
+        "project": project,
+        "name": name,
+        "exist_ok": True,
+        "verbose": verbose,
+    })
+
+    # Ultralytics may override the worker count (0 on cpu/mps); record what actually ran
+    trainer = getattr(model, "trainer", None)
+    if trainer is not None:
+        workers = int(trainer.args.workers)
+        print(f"Dataloader workers used: {workers}")
 
     # Identify saved weights
     weights_dir = os.path.join(project, name, "weights")
@@ -94,6 +200,8 @@ def main(cfg: DictConfig):
         "image_size": imgsz,
         "batch_size": batch,
         "learning_rate": lr,
+        "workers": workers,
+        "train_args": train_args,
         "best_weights": final_weights,
     }
     with open(os.path.join(run_dir, "training_summary.json"), "w") as f:
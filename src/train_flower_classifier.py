@@ -98,10 +98,11 @@ def main(cfg: DictConfig):
     pretrained = bool(cfg.get("pretrained", True))
     num_classes_cfg = cfg.get("num_classes", None)
 
-    # Create artifact run directory with timestamp
+    # Create artifact run directory with timestamp (or use the one given, e.g. by a sweep)
     artifact_root = os.path.join(orig_cwd, "artifacts", "flower_classifier")
     timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    run_dir = os.path.join(artifact_root, timestamp)
+    run_dir = cfg.get("run_dir", None)
+    run_dir = os.path.join(orig_cwd, run_dir) if run_dir else os.path.join(artifact_root, timestamp)
     os.makedirs(run_dir, exist_ok=True)
 
     # Save used config to run directory